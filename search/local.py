@@ -1,24 +1,49 @@
 # coding=utf-8
 from simpleai.search.utils import BoundedPriorityQueue, InverseTransformSampler
 from simpleai.search.models import SearchNodeValueOrdered
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import chain
 import math
+import multiprocessing
 import random
+import sys
 
 
-def _all_expander(fringe, iteration, viewer):
+def _expand(node):
     '''
-    Expander that expands all nodes on the fringe.
+    Expands the node for local search. If the problem has
+    deterministic_successors, the node is expanded only once and the
+    successors are kept on it for the iterations in which it stays on the
+    fringe. Otherwise (for example when actions samples a few random moves)
+    it is expanded again each time.
     '''
-    expanded_neighbors = [node.expand(local_search=True)
-                          for node in fringe]
+    if not getattr(node.problem, 'deterministic_successors', False):
+        return node.expand(local_search=True)
+    try:
+        return node.local_neighbors
+    except AttributeError:
+        node.local_neighbors = node.expand(local_search=True)
+        return node.local_neighbors
 
-    if viewer:
+
+def _create_all_expander(viewer=None):
+    '''
+    Creates an expander that expands all nodes on the fringe.
+    '''
+    def _expander(fringe, iteration):
+        expanded_neighbors = [_expand(node) for node in fringe]
+        fringe.merge_and_truncate(chain.from_iterable(expanded_neighbors))
+
+    def _viewed_expander(fringe, iteration):
+        expanded_neighbors = [_expand(node) for node in fringe]
         viewer.event('expanded', list(fringe), expanded_neighbors)
+        fringe.merge_and_truncate(chain.from_iterable(expanded_neighbors))
 
-    list(map(fringe.extend, expanded_neighbors))
+    return _viewed_expander if viewer else _expander
 
 
-def beam(problem, beam_size=100, iterations_limit=0, viewer=None):
+def beam(problem, beam_size=100, iterations_limit=0, viewer=None, verbose=False):
     '''
     Beam search.
 
@@ -26,32 +51,41 @@ def beam(problem, beam_size=100, iterations_limit=0, viewer=None):
     If iterations_limit is specified, the algorithm will end after that
     number of iterations. Else, it will continue until it can't find a
     better node than the current one.
+    If verbose is True, the progress and the visited nodes are printed.
+    If the problem has a value_batch method, receiving a list of states and
+    returning their values, the random initial states are valued with a single
+    call to it.
     Requires: SearchProblem.actions, SearchProblem.result, SearchProblem.value,
     and SearchProblem.generate_random_state.
     '''
     return _local_search(problem,
-                         _all_expander,
+                         _create_all_expander,
                          iterations_limit=iterations_limit,
                          fringe_size=beam_size,
                          random_initial_states=True,
                          stop_when_no_better=iterations_limit == 0,
-                         viewer=viewer)
+                         viewer=viewer,
+                         verbose=verbose)
 
 
-def _first_expander(fringe, iteration, viewer):
+def _create_first_expander(viewer=None):
     '''
-    Expander that expands only the first node on the fringe.
+    Creates an expander that expands only the first node on the fringe.
     '''
-    current = fringe[0]
-    neighbors = current.expand(local_search=True)
+    def _expander(fringe, iteration):
+        fringe.extend(_expand(fringe[0]))
 
-    if viewer:
+    def _viewed_expander(fringe, iteration):
+        current = fringe[0]
+        neighbors = _expand(current)
         viewer.event('expanded', [current], [neighbors])
+        fringe.extend(neighbors)
 
-    fringe.extend(neighbors)
+    return _viewed_expander if viewer else _expander
 
 
-def beam_best_first(problem, beam_size=100, iterations_limit=0, viewer=None):
+def beam_best_first(problem, beam_size=100, iterations_limit=0, viewer=None,
+                    verbose=False):
     '''
     Beam search best first.
 
@@ -59,74 +93,106 @@ def beam_best_first(problem, beam_size=100, iterations_limit=0, viewer=None):
     If iterations_limit is specified, the algorithm will end after that
     number of iterations. Else, it will continue until it can't find a
     better node than the current one.
+    If verbose is True, the progress and the visited nodes are printed.
+    If the problem has a value_batch method, receiving a list of states and
+    returning their values, the random initial states are valued with a single
+    call to it.
     Requires: SearchProblem.actions, SearchProblem.result, and
     SearchProblem.value.
     '''
     return _local_search(problem,
-                         _first_expander,
+                         _create_first_expander,
                          iterations_limit=iterations_limit,
                          fringe_size=beam_size,
                          random_initial_states=True,
                          stop_when_no_better=iterations_limit == 0,
-                         viewer=viewer)
+                         viewer=viewer,
+                         verbose=verbose)
 
 
-def hill_climbing(problem, iterations_limit=0, viewer=None):
+def hill_climbing(problem, iterations_limit=0, viewer=None, verbose=False):
     '''
     Hill climbing search.
 
     If iterations_limit is specified, the algorithm will end after that
     number of iterations. Else, it will continue until it can't find a
     better node than the current one.
+    If verbose is True, the progress and the visited nodes are printed.
     Requires: SearchProblem.actions, SearchProblem.result, and
     SearchProblem.value.
     '''
     return _local_search(problem,
-                         _first_expander,
+                         _create_first_expander,
                          iterations_limit=iterations_limit,
                          fringe_size=1,
                          stop_when_no_better=True,
-                         viewer=viewer)
+                         viewer=viewer,
+                         verbose=verbose)
 
 
-def _random_best_expander(fringe, iteration, viewer):
+def _choose_better(current, neighbors):
     '''
-    Expander that expands one randomly chosen nodes on the fringe that
-    is better than the current (first) node.
+    Chooses randomly one of the neighbors better than current, or None.
+    One pass with reservoir sampling, so every better neighbor has the same
+    chance without building a list of them.
     '''
-    current = fringe[0]
-    neighbors = current.expand(local_search=True)
-    if viewer:
+    chosen = None
+    count = 0
+    current_value = current.value
+    for n in neighbors:
+        if n.value > current_value:
+            count += 1
+            if random.random() * count < 1.0:
+                chosen = n
+    return chosen
+
+
+def _create_random_best_expander(viewer=None):
+    '''
+    Creates an expander that expands one randomly chosen nodes on the fringe
+    that is better than the current (first) node.
+    '''
+    def _expander(fringe, iteration):
+        current = fringe[0]
+        chosen = _choose_better(current, _expand(current))
+        if chosen is not None:
+            fringe.append(chosen)
+
+    def _viewed_expander(fringe, iteration):
+        current = fringe[0]
+        neighbors = _expand(current)
         viewer.event('expanded', [current], [neighbors])
 
-    betters = [n for n in neighbors
-               if n.value > current.value]
-    if betters:
-        chosen = random.choice(betters)
-        if viewer:
+        chosen = _choose_better(current, neighbors)
+        if chosen is not None:
             viewer.event('chosen_node', chosen)
-        fringe.append(chosen)
+            fringe.append(chosen)
+
+    return _viewed_expander if viewer else _expander
 
 
-def hill_climbing_stochastic(problem, iterations_limit=0, viewer=None):
+def hill_climbing_stochastic(problem, iterations_limit=0, viewer=None, verbose=False):
     '''
     Stochastic hill climbing.
 
     If iterations_limit is specified, the algorithm will end after that
     number of iterations. Else, it will continue until it can't find a
     better node than the current one.
+    If verbose is True, the progress and the visited nodes are printed.
     Requires: SearchProblem.actions, SearchProblem.result, and
     SearchProblem.value.
     '''
     return _local_search(problem,
-                         _random_best_expander,
+                         _create_random_best_expander,
                          iterations_limit=iterations_limit,
                          fringe_size=1,
                          stop_when_no_better=iterations_limit == 0,
-                         viewer=viewer)
+                         viewer=viewer,
+                         verbose=verbose)
 
 
-def hill_climbing_random_restarts(problem, restarts_limit, iterations_limit=0, viewer=None):
+def hill_climbing_random_restarts(problem, restarts_limit, iterations_limit=0, viewer=None,
+                                  verbose=False):
     '''
     Hill climbing with random restarts.
 
@@ -134,6 +200,10 @@ def hill_climbing_random_restarts(problem, restarts_limit, iterations_limit=0, v
     If iterations_limit is specified, each hill_climbing will end after that
     number of iterations. Else, it will continue until it can't find a
     better node than the current one.
+    If verbose is True, the progress and the visited nodes are printed.
+    If the problem has a value_batch method, receiving a list of states and
+    returning their values, the random initial states are valued with a single
+    call to it.
     Requires: SearchProblem.actions, SearchProblem.result, SearchProblem.value,
     and SearchProblem.generate_random_state.
     '''
@@ -142,12 +212,13 @@ def hill_climbing_random_restarts(problem, restarts_limit, iterations_limit=0, v
 
     while restarts < restarts_limit:
         new = _local_search(problem,
-                            _first_expander,
+                            _create_first_expander,
                             iterations_limit=iterations_limit,
                             fringe_size=1,
                             random_initial_states=True,
                             stop_when_no_better=True,
-                            viewer=viewer)
+                            viewer=viewer,
+                            verbose=verbose)
 
         if not best or best.value < new.value:
             best = new
@@ -168,72 +239,110 @@ def _exp_schedule(iteration, k=20, lam=0.005, limit=100):
     return k * math.exp(-lam * iteration)
 
 
-def _create_simulated_annealing_expander(schedule):
+# temperature at or under which simulated annealing is considered frozen
+_T_FLOOR = 1e-6
+
+
+def _geometric_schedule(iteration, T0=10.0, alpha=0.95, L=20, T_floor=_T_FLOOR):
+    '''
+    Geometric cooling for simulated_annealing: the temperature is multiplied
+    by alpha every L iterations, and never goes below T_floor.
+    '''
+    return max(T_floor, T0 * alpha ** (iteration // L))
+
+
+def _sa_accept(delta_e, T, u):
+    '''
+    Acceptance test of simulated_annealing for a worse node, u is a random
+    number in [0, 1).
+    '''
+    return u < math.exp(delta_e / T)
+
+
+def _create_simulated_annealing_expander(schedule, viewer=None):
     '''
     Creates an expander that has a random chance to choose a node that is worse
     than the current (first) node, but that chance decreases with time.
+    Once the temperature is down to _T_FLOOR the system is frozen, and only
+    better nodes are chosen, without calculating the chance.
     '''
 
-    def _expander(fringe, iteration, viewer):
+    def _expander(fringe, iteration):
         T = schedule(iteration)
         current = fringe[0]
-        neighbors = current.expand(local_search=True)
-
-        if viewer:
-            viewer.event('expanded', [current], [neighbors])
+        neighbors = _expand(current)
 
         if neighbors:
             succ = random.choice(neighbors)
             delta_e = succ.value - current.value
-            if delta_e > 0 or random.random() < math.exp(delta_e / T):
+            if delta_e > 0 or (T > _T_FLOOR and _sa_accept(delta_e, T, random.random())):
                 fringe.pop()
                 fringe.append(succ)
 
-                if viewer:
-                    viewer.event('chosen_node', succ)
+    def _viewed_expander(fringe, iteration):
+        T = schedule(iteration)
+        current = fringe[0]
+        neighbors = _expand(current)
+        viewer.event('expanded', [current], [neighbors])
 
-    return _expander
+        if neighbors:
+            succ = random.choice(neighbors)
+            delta_e = succ.value - current.value
+            if delta_e > 0 or (T > _T_FLOOR and _sa_accept(delta_e, T, random.random())):
+                fringe.pop()
+                fringe.append(succ)
+                viewer.event('chosen_node', succ)
 
+    return _viewed_expander if viewer else _expander
 
-def simulated_annealing(problem, schedule=_exp_schedule, iterations_limit=0, viewer=None):
+
+def simulated_annealing(problem, schedule=_geometric_schedule, iterations_limit=0, viewer=None,
+                        verbose=False):
     '''
     Simulated annealing.
 
     schedule is the scheduling function that decides the chance to choose worst
-    nodes depending on the time.
+    nodes depending on the time. By default the temperature cools geometrically.
     If iterations_limit is specified, the algorithm will end after that
     number of iterations. Else, it will continue until it can't find a
     better node than the current one.
+    If verbose is True, the progress and the visited nodes are printed.
     Requires: SearchProblem.actions, SearchProblem.result, and
     SearchProblem.value.
     '''
     return _local_search(problem,
-                         _create_simulated_annealing_expander(schedule),
+                         partial(_create_simulated_annealing_expander, schedule),
                          iterations_limit=iterations_limit,
                          fringe_size=1,
                          stop_when_no_better=iterations_limit == 0,
-                         viewer=viewer)
+                         viewer=viewer,
+                         verbose=verbose)
 
 
-def _create_genetic_expander(problem, crossover_rate, mutation_chance):
+def _create_genetic_expander(problem, crossover_rate, mutation_chance, verbose=False,
+                             map_values=None, viewer=None):
     '''
     Creates an expander that expands the bests nodes of the population,
     crossing over them.
+    If map_values is given, the values of each new generation are calculated
+    with it (it maps problem.value over a list of states, in parallel).
+    The expanded nodes for the viewer are only collected when there is one.
     '''
     '''global elite_list
     elite_list = []'''
 
-    def _expander(fringe, iteration, viewer):  # 毎世代ごとに呼ばれる
-        fitness = [x.value for x in fringe]  # 遺伝子であるベクトルの配列、weightでもある
-        sampler = InverseTransformSampler(fitness, fringe)  # おそらく個体、objectでもある
+    def _expander(fringe, iteration):  # 毎世代ごとに呼ばれる
+        population = list(fringe)
+        fitness = [x.value for x in population]  # 遺伝子であるベクトルの配列、weightでもある
+        sampler = InverseTransformSampler(fitness, population)  # おそらく個体、objectでもある
         new_generation = []  # 新世代
         # これらのリストはこの関数呼び出す毎に初期化されている
 
         elitest_node = sampler.best()
+        if verbose:
+            print(f"elite:{elitest_node.state}, fitness={elitest_node.value}")
         new_generation.append(elitest_node)
 
-        expanded_nodes = []
-        expanded_neighbors = []
         '''elite = fringe[0]# ここでのエラーではない
         elite_list.append(elite)'''
 
@@ -250,59 +359,61 @@ def _create_genetic_expander(problem, crossover_rate, mutation_chance):
         #         child = problem.mutate(child)
         #         action += '+mutation'
 
-        for _ in range(len(fringe) - 1):
+        # 交叉・突然変異の判定と親は世代ごとにまとめて決めておく
+        children_count = len(population) - 1
+        crossovers = [random.random() < crossover_rate for _ in range(children_count)]
+        mutations = [random.random() < mutation_chance for _ in range(children_count)]
+        parents = sampler.sample_many(children_count)
+        # 二つ目の親は交叉する子の分だけ選ぶ
+        partners = iter(sampler.sample_many(sum(crossovers)))
+
+        children = []
+        for node1, crossover, mutation in zip(parents, crossovers, mutations):
             action = ''
-            did_crossover = False
-            if random.random() < crossover_rate:
-                node1 = sampler.sample()
-                node2 = sampler.sample()
+            if crossover:
+                node2 = next(partners)
                 child = problem.crossover(node1.state, node2.state)
                 action = 'crossover'
-                did_crossover = True
+                selected = [node1, node2]
             else:
-                selected = sampler.sample() # 親世代からほぼランダムで一個選択している。だから親世代と同じやつが選ばれるはず
-                child = selected.state
+                child = node1.state # 親世代からほぼランダムで一個選択している。だから親世代と同じやつが選ばれるはず
+                selected = [node1]
 
-            if random.random() < mutation_chance:
+            if mutation:
                 # Noooouuu! she is... he is... *IT* is a mutant!
                 child = problem.mutate(child)
                 action = action + '+mutation' if 0 < len(action) else 'mutation'
 
+            children.append((child, action, selected))
+
+        # 適応度の計算は世代ごとにまとめて行う(value_batchかmap_valuesがあればそれで)
+        values = _evaluate(problem, [child for child, _, _ in children], map_values)
+
+        for i, (child, action, selected) in enumerate(children):
             child_node = SearchNodeValueOrdered(state=child, problem=problem,
-                                                action=action)  # これが意味わからない、聞く、nodeの順番逆にしてる？意味わからない
-            # valueを自分の設定したvalueに置き換えている、stateがchildなこと忘れず
+                                                action=action,
+                                                value=values[i] if values else None)
             # child_nodeに何が入っているのか？おそらく一個体の遺伝子情報だと考えられる
             new_generation.append(child_node)  # 新世代のリストに個体を一個追加している
 
-            if did_crossover:
-                expanded_nodes.append(node1)
-                expanded_neighbors.append([child_node])
-                expanded_nodes.append(node2)
-                expanded_neighbors.append([child_node])
-            else:
-                expanded_nodes.append(selected)
-                expanded_neighbors.append([child_node])
-            # expanded_nodes.append(node1)# これらは途中経過のために作っているだけか？
-            # expanded_neighbors.append([child_node])
-            # # このneighborが何のためにあるか調べる
-            # expanded_nodes.append(node2)
-            # expanded_neighbors.append([child_node])#何で2回？これは分からないが何か意味ありそう
-
         if viewer:
+            expanded_nodes = []
+            expanded_neighbors = []
+            for (_, _, selected), child_node in zip(children, new_generation[1:]):
+                for node in selected:
+                    expanded_nodes.append(node)
+                    expanded_neighbors.append([child_node])
             viewer.event('expanded', expanded_nodes, expanded_neighbors)
 
-        fringe.clear()  # 毎回fringeをリセットしている。親世代の削除とも言える
+        # 毎回fringeを新世代で置き換えている。親世代の削除とも言える
         '''new_generation[0] = elite[0]　# これに対するエラー'''
-        for node in new_generation:
-            fringe.append(node)
-            # ここで新しく子世代を親世代に変更？
-            # ここにエリートをfringeに入れるようにしてあげられたらオッケー?,いや、crossoverなどする前に親世代の中で一番いいやつ残さないといけない
+        fringe.replace_all(new_generation)
 
     return _expander
 
 
 def genetic(problem, population_size=100, crossover_rate=0.6, mutation_chance=0.1,
-            iterations_limit=0, viewer=None):
+            iterations_limit=0, viewer=None, verbose=False, workers=0):
     '''
     Genetic search.
 
@@ -312,70 +423,179 @@ def genetic(problem, population_size=100, crossover_rate=0.6, mutation_chance=0.
     If iterations_limit is specified, the algorithm will end after that
     number of iterations. Else, it will continue until it can't find a
     better node than the current one.
+    If verbose is True, the progress and the visited nodes are printed.
+    If workers is specified, the values of each generation are calculated
+    in parallel by that number of processes (the problem must be picklable),
+    or threads on free-threaded Python builds.
+    If the problem has a value_batch method, receiving a list of states and
+    returning their values, each generation is valued with a single call to it.
     Requires: SearchProblem.generate_random_state, SearchProblem.crossover,
     SearchProblem.mutate and SearchProblem.value.
     '''
+    if not workers or getattr(problem, 'value_batch', None) is not None:
+        # value_batch takes precedence, a pool would never be used
+        return _genetic(problem, population_size, crossover_rate, mutation_chance,
+                        iterations_limit, viewer, verbose)
+
+    if _gil_disabled():
+        # free-threaded Python: threads run in parallel, without pickling
+        executor = ThreadPoolExecutor(workers)
+    else:
+        executor = multiprocessing.Pool(workers)
+
+    # each worker receives a few states at a time
+    chunksize = max(1, population_size // (4 * workers))
+
+    # the pool lives during the whole search, not a generation
+    with executor as pool:
+        map_values = partial(pool.map, problem.value, chunksize=chunksize)
+        return _genetic(problem, population_size, crossover_rate, mutation_chance,
+                        iterations_limit, viewer, verbose, map_values)
+
+
+def _genetic(problem, population_size, crossover_rate, mutation_chance,
+             iterations_limit, viewer, verbose, map_values=None):
     return _local_search(problem,
-                         _create_genetic_expander(problem, crossover_rate, mutation_chance),
+                         partial(_create_genetic_expander, problem, crossover_rate,
+                                 mutation_chance, verbose, map_values),
                          iterations_limit=iterations_limit,
                          fringe_size=population_size,
                          random_initial_states=True,
                          stop_when_no_better=iterations_limit == 0,
-                         viewer=viewer)
+                         viewer=viewer,
+                         verbose=verbose,
+                         map_values=map_values)
 
 
-def _local_search(problem, fringe_expander, iterations_limit=0, fringe_size=1,
+def _gil_disabled():
+    '''
+    Returns True on free-threaded Python builds running without the GIL.
+    '''
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def _evaluate(problem, states, map_values=None):
+    '''
+    Calculates the values of states at once, with problem.value_batch if the
+    problem has it, or else with map_values (a chunked map of problem.value
+    over a worker pool).
+    Returns None otherwise, so nodes calculate their own values.
+    '''
+    if not states:
+        return []
+    value_batch = getattr(problem, 'value_batch', None)
+    if value_batch is not None:
+        return list(value_batch(states))
+    if map_values is None:
+        return None
+    return list(map_values(states))
+
+
+def _distinct_nodes(nodes):
+    '''
+    Returns the nodes with different states, in order of first appearance.
+    '''
+    distinct = {}
+    try:
+        for node in nodes:
+            distinct.setdefault(node.state, node)
+    except TypeError:
+        # unhashable states, they can only be compared one by one
+        distinct = []
+        for node in nodes:
+            if node not in distinct:
+                distinct.append(node)
+        return distinct
+    return list(distinct.values())
+
+
+def _local_search(problem, create_expander, iterations_limit=0, fringe_size=1,
                   random_initial_states=False, stop_when_no_better=True,
-                  viewer=None):
+                  viewer=None, verbose=False, map_values=None):
     '''
     Basic algorithm for all local search algorithms.
+    create_expander receives the viewer and returns the expander, so the
+    expander is chosen once and doesn't check for the viewer on each iteration.
     '''
     if viewer:
         viewer.event('started')
 
+    fringe_expander = create_expander(viewer=viewer)
+
     fringe = BoundedPriorityQueue(fringe_size)
     if random_initial_states:
-        for _ in range(fringe_size):
-            s = problem.generate_random_state()
-            fringe.append(SearchNodeValueOrdered(state=s, problem=problem))
+        states = [problem.generate_random_state() for _ in range(fringe_size)]
+        values = _evaluate(problem, states, map_values)
+        for i, s in enumerate(states):
+            fringe.append(SearchNodeValueOrdered(state=s, problem=problem,
+                                                 value=values[i] if values else None))
     else:
         fringe.append(SearchNodeValueOrdered(state=problem.initial_state,
                                              problem=problem))
 
+    if iterations_limit and not stop_when_no_better and not verbose:
+        finish_reason = _iterate_until_limit(fringe, fringe_expander, iterations_limit)
+    else:
+        finish_reason = _iterate(fringe, fringe_expander, iterations_limit,
+                                 stop_when_no_better, verbose)
+
+    best = fringe[0]
+    if viewer:
+        viewer.event('finished', fringe, best, 'returned after %s' % finish_reason)
+
+    return best
+
+
+def _iterate_until_limit(fringe, fringe_expander, iterations_limit):
+    '''
+    Main loop of local search when only the iterations limit can end it, so
+    nothing but the expander runs on each iteration.
+    Returns the reason to finish.
+    '''
+    for iteration in range(iterations_limit):
+        fringe_expander(fringe, iteration)
+    return 'reaching iteration limit'
+
+
+def _iterate(fringe, fringe_expander, iterations_limit, stop_when_no_better, verbose):
+    '''
+    Main loop of local search, checking after each iteration whether the
+    solution improved.
+    Returns the reason to finish.
+    '''
     finish_reason = ''
     iteration = 0
     run = True
-    best = None
+    best_value = fringe[0].value
     word_list = []
     while run:
         # if viewer:
         #     viewer.event('new_iteration', list(fringe))
 
-        old_best = fringe[0]
-        # print(f"old:{fringe[0]}")
-        fringe_expander(fringe, iteration, viewer)
+        # 前の世代の一番良いvalueだけ覚えておけば比較できる
+        old_best_value = best_value
+        fringe_expander(fringe, iteration)
         # newnodeの入ったexpanded_neighborsがfringeに入れられた状態
         best = fringe[0]
-        word_list.append(fringe[0])
+        best_value = best.value
         # print(f"new:{fringe[0]}")
         # print(f"fringe:{fringe[1]}")
 
         iteration += 1
-        print(f"↑{iteration}回目")
-        print("                        ")
+        if verbose:
+            word_list.append(best)
+            print(f"↑{iteration}回目")
+            print("                        ")
         if iterations_limit and iteration >= iterations_limit:
             run = False
             finish_reason = 'reaching iteration limit'
-        elif old_best.value >= best.value and stop_when_no_better:
+        elif stop_when_no_better and old_best_value >= best_value:
             run = False
             finish_reason = 'not being able to improve solution'
-    double_list = []
-    for i in word_list:
-        if i not in double_list:
-            double_list.append(i)
-    print(f"探索に掛かった単語数：{len(double_list)}")
-    print(f"探索過程：{double_list}")
-    if viewer:
-        viewer.event('finished', fringe, best, 'returned after %s' % finish_reason)
+    if verbose:
+        double_list = _distinct_nodes(word_list)
+        print(f"探索に掛かった単語数：{len(double_list)}")
+        print(f"探索過程：{double_list}")
 
-    return best
+    return finish_reason
@@ -14,6 +14,11 @@ class SearchProblem(object):
        algorithm you will use.
        '''
 
+    # Set to True when `actions` and `result` always give the same successors
+    # for a state, so local search can keep the successors of a node instead of
+    # expanding it again on every iteration it stays on the fringe.
+    deterministic_successors = False
+
     def __init__(self, initial_state=None):
         self.initial_state = initial_state
 
@@ -153,11 +158,14 @@ class SearchNodeCostOrdered(SearchNode):
 
 
 class SearchNodeValueOrdered(SearchNode):
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, value=None, **kwargs):
         super(SearchNodeValueOrdered, self).__init__(*args, **kwargs)
         # 親クラスの__init__を呼び出す、self.valueを呼ぶため
-        self.value = self.problem.value(self.state)
-        # 自分の設定したvalueを呼び出す
+        if value is None:
+            value = self.problem.value(self.state)
+            # 自分の設定したvalueを呼び出す
+        # valueが計算済み(並列で評価した等)ならそれを使う
+        self.value = value
 
     def __lt__(self, other):
         # value must work inverted, because heapq sorts 1-9
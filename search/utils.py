@@ -1,11 +1,10 @@
 # coding=utf-8
 import heapq
+import math
 from collections import deque
+from itertools import accumulate, chain
+import operator
 import random
-try:
-    from itertools import izip
-except ImportError:
-    izip = zip
 
 
 class LifoList(deque):
@@ -24,39 +23,133 @@ class FifoList(deque):
         return list(self)
 
 
+class _Reversed(object):
+    '''Wraps an item inverting its ordering, so heapq keeps the worst first.'''
+    __slots__ = ('item',)
+
+    def __init__(self, item):
+        self.item = item
+
+    def __lt__(self, other):
+        return other.item < self.item
+
+
 class BoundedPriorityQueue(object):
     def __init__(self, limit=None, *args):
         self.limit = limit
+        # without limit this is a plain heap with the best item first. With
+        # a limit it is a heap of _Reversed items with the worst one first, so
+        # the item to discard is always at hand, and the best one is cached.
+        # Iteration follows heap order, indexing follows sorted order: the
+        # sorted items are cached until the next change, so only the first
+        # index after a change costs a sort.
         self.queue = list()
+        self._best = None
+        self._sorted = None
 
     def __getitem__(self, val):
-        return self.queue[val]
+        if not self.limit:
+            return self.queue[val]
+        if val == 0:
+            return self._first()
+        if self._sorted is None:
+            self._sorted = self.sorted()
+        return self._sorted[val]
+
+    def __iter__(self):
+        if not self.limit:
+            return iter(self.queue)
+        return (x.item for x in self.queue)
 
     def __len__(self):
         return len(self.queue)
 
+    def _first(self):
+        if self._best is None:
+            if not self.queue:
+                raise IndexError('queue index out of range')
+            # the best item is the largest of the reversed ones
+            self._best = max(self.queue).item
+        return self._best
+
     def append(self, x):
-        heapq.heappush(self.queue, x)
-        if self.limit and len(self.queue) > self.limit:
-            self.queue.remove(heapq.nlargest(1, self.queue)[0])
-            heapq.heapify(self.queue)
+        if not self.limit:
+            heapq.heappush(self.queue, x)
+            return
+
+        if len(self.queue) < self.limit:
+            heapq.heappush(self.queue, _Reversed(x))
+            discarded = None
+        else:
+            discarded = heapq.heappushpop(self.queue, _Reversed(x)).item
+        self._sorted = None
+
+        if self._best is not None:
+            if discarded is self._best:
+                self._best = None
+            elif discarded is not x and x < self._best:
+                self._best = x
 
     def pop(self):
-        return heapq.heappop(self.queue)
+        if not self.limit:
+            return heapq.heappop(self.queue)
+        if not self.queue:
+            raise IndexError('pop from an empty queue')
+        # one scan for the position of the best item, instead of another one
+        # inside list.remove
+        index = max(range(len(self.queue)), key=self.queue.__getitem__)
+        best = self.queue[index].item
+        del self.queue[index]
+        heapq.heapify(self.queue)
+        self._best = None
+        self._sorted = None
+        return best
 
     def extend(self, iterable):
         for x in iterable:
             self.append(x)
 
+    def merge_and_truncate(self, new_items):
+        if not self.limit:
+            self.extend(new_items)
+            return
+        # one selection of the bests, instead of a bounded insertion per item
+        self._set_sorted(heapq.nsmallest(self.limit, chain(self, new_items)))
+
+    def replace_all(self, iterable):
+        if not self.limit:
+            self.queue = list(iterable)
+            heapq.heapify(self.queue)
+            return
+        self._set_sorted(heapq.nsmallest(self.limit, iterable))
+
+    def _set_sorted(self, items):
+        # reversed, a sorted list is already a heap with the worst item first
+        self.queue = [_Reversed(x) for x in reversed(items)]
+        self._best = items[0] if items else None
+        self._sorted = items
+
     def clear(self):
         self.queue.clear()
+        self._best = None
+        self._sorted = None
 
     def remove(self, x):
-        self.queue.remove(x)
+        if not self.limit:
+            self.queue.remove(x)
+        else:
+            for index, y in enumerate(self.queue):
+                if y.item == x:
+                    del self.queue[index]
+                    break
+            else:
+                raise ValueError('item not in queue')
+            self._best = None
+            self._sorted = None
         heapq.heapify(self.queue)
 
     def sorted(self):
-        return heapq.nsmallest(len(self.queue), self.queue)
+        return heapq.nsmallest(len(self.queue), self)
         # 使えるかも
 
 class InverseTransformSampler(object):
@@ -65,48 +158,51 @@ class InverseTransformSampler(object):
         assert weights and objects and len(weights) == len(objects)
         self.objects = objects
         self.weights = weights
-        tot = float(sum(weights))
-        if tot == 0:
-            tot = len(weights)
+        total = sum(weights)
+        if min(weights) < 0 or not math.isfinite(total) or total <= 0:
             weights = [1 for x in weights] # weightの数文の1の配列を作っている
-            # もしweightの合計が０なら重みを全部1にしている
-        accumulated = 0
-        self.probs = [] # これが謎
-        for w, x in izip(weights, objects):
-            p = w / tot  # それぞれの個体の適応度をpにいれている？いみわからん
-            accumulated += p
-            self.probs.append(accumulated)
+            # もし負のweightがある、または合計が正の有限な数でないなら重みを全部1にしている
+            # (random.choicesは単調増加で合計が正の累積の重みでないと使えない)
+        # 累積の重み、random.choicesに渡す
+        self.cum_weights = list(accumulate(weights))
 
     def sample(self):
-        # ここを変えたらよさげ！
-        target = random.random()
-        i = 0
-        while i + 1 != len(self.probs) and target > self.probs[i]:
-            i += 1
-        return self.objects[i] # fringeがobjects
+        return random.choices(self.objects, cum_weights=self.cum_weights)[0] # fringeがobjects
         # 良く分からんが個体を一個返す。返す個体はランダム。だからランダム探索になっている
 
+    def sample_many(self, k):
+        return random.choices(self.objects, cum_weights=self.cum_weights, k=k)
+
     def best(self):
         max_idx = 0
         for idx,obj in enumerate(self.objects):
             if self.weights[max_idx] < self.weights[idx]:
                 max_idx = idx
 
-        print(f"elite:{self.objects[max_idx].state}, fitness={self.weights[max_idx]}")
         return self.objects[max_idx]
 
 
-def _generic_arg(iterable, function, better_function):
-    values = [function(x) for x in iterable]
-    better_value = better_function(values)
-    candidates = [x for x, value in zip(iterable, values) if value == better_value]
-    return random.choice(candidates)
+def _generic_arg(iterable, function, is_better):
+    # one pass, choosing randomly among ties with reservoir sampling
+    best = None
+    best_value = None
+    count = 0
+    for x in iterable:
+        value = function(x)
+        if count == 0 or is_better(value, best_value):
+            best, best_value, count = x, value, 1
+        elif value == best_value:
+            count += 1
+            if random.random() < 1.0 / count:
+                best = x
+    if count == 0:
+        raise ValueError('argmin/argmax of an empty iterable')
+    return best
 
 
 def argmin(iterable, function):
-    return _generic_arg(iterable, function, min)
+    return _generic_arg(iterable, function, operator.lt)
 
 
 def argmax(iterable, function):
-    return _generic_arg(iterable, function, max)
-
+    return _generic_arg(iterable, function, operator.gt)